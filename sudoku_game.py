@@ -1,9 +1,16 @@
 import pygame
-import random
 import time
 import json
 import os
-from copy import deepcopy
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from sudoku_solver import PEERS, BOX_CELLS, to_board, solve_board, generate_puzzle
+
+try:
+    import orjson  # optional, much faster than the stdlib encoder
+except ImportError:
+    orjson = None
 
 pygame.init()
 pygame.font.init()
@@ -18,6 +25,16 @@ GRID_SIZE = 9
 GRID_AREA = 560
 CELL_SIZE = GRID_AREA // GRID_SIZE
 GRID_ORIGIN = (35, 35)
+PANEL_X = GRID_ORIGIN[0] + 9*CELL_SIZE + 10
+PANEL_RECT = pygame.Rect(PANEL_X, 0, WIN_WIDTH - PANEL_X, WIN_HEIGHT)
+# the board is rendered off-screen; the margin keeps the thick outer grid lines inside it
+BOARD_MARGIN = 3
+BOARD_RECT = pygame.Rect(GRID_ORIGIN[0] - BOARD_MARGIN, GRID_ORIGIN[1] - BOARD_MARGIN,
+                         9*CELL_SIZE + 2*BOARD_MARGIN, 9*CELL_SIZE + 2*BOARD_MARGIN)
+# side panel buttons (drawn only) and the keyboard shortcut each one names
+BUTTONS = [("New (G)",pygame.K_g),("Hint (H)",pygame.K_h),("Notes (N)",pygame.K_n),("Undo (U)",pygame.K_u),
+           ("Redo (R)",pygame.K_r),("Save (S)",pygame.K_s),("Load (L)",pygame.K_l),("Toggle Check (C)",pygame.K_c),
+           ("Pause (P)",pygame.K_p),("Theme (T)",pygame.K_t)]
 STATS_FILE = "sudoku_stats.json"
 AUTOSAVE_FILE = "sudoku_autosave.json"
 SAVE_SLOTS = {
@@ -56,11 +73,35 @@ THEMES = {
 screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
 pygame.display.set_caption("Sudoku - Python")
 
+BOARD_SURFACE = pygame.Surface(BOARD_RECT.size)
+
 FONT_BIG = pygame.font.SysFont("Arial", 36)
 FONT_MED = pygame.font.SysFont("Arial", 20)
 FONT_SMALL = pygame.font.SysFont("Arial", 14)
 FONT_TITLE = pygame.font.SysFont("Arial", 48)
 
+# digit glyphs never change, so rasterize them once per theme instead of every frame
+def _glyph(font, text, color):
+    surf = font.render(text, True, color)
+    return surf, surf.get_width(), surf.get_height()
+
+DIGIT_CACHE = {(theme_name, role, n): _glyph(FONT_BIG, str(n), THEMES[theme_name][role])
+               for theme_name in THEMES for role in ("givens", "user") for n in range(1, 10)}
+NOTE_CACHE = {(theme_name, n): FONT_SMALL.render(str(n), True, THEMES[theme_name]["note"])
+              for theme_name in THEMES for n in range(1, 10)}
+# smoothscaled digits for the pop-in animation, keyed by a 10-step quantized scale
+SCALE_STEPS = 10
+SCALED_DIGIT_CACHE = {}
+
+def scaled_digit(theme_name, role, n, step):
+    key = (theme_name, role, n, step)
+    if key not in SCALED_DIGIT_CACHE:
+        surf, w, h = DIGIT_CACHE[(theme_name, role, n)]
+        scale = 1 + 0.2*step/SCALE_STEPS
+        w, h = int(w*scale), int(h*scale)
+        SCALED_DIGIT_CACHE[key] = (pygame.transform.smoothscale(surf, (w, h)), w, h)
+    return SCALED_DIGIT_CACHE[key]
+
 # --- Sounds ---
 SOUND_PATH = os.path.join("assets", "sounds")
 def load_sound(name):
@@ -84,113 +125,91 @@ sound_win = load_sound("win.mp3")
 # if sound_error: sound_error.play()
 # if sound_win: sound_win.play()
 
-# --- Sudoku utilities ---
-def find_empty(grid):
-    for r in range(9):
-        for c in range(9):
-            if grid[r][c] == 0:
-                return r, c
-    return None
+# --- Drawing helpers ---
+def button_rect(i):
+    return pygame.Rect(PANEL_X, GRID_ORIGIN[1] + i*50, WIN_WIDTH - PANEL_X - 20, 40)
 
-def valid(grid, r, c, val):
-    for i in range(9):
-        if grid[r][i] == val or grid[i][c] == val:
-            return False
-    br, bc = 3*(r//3), 3*(c//3)
-    for i in range(br, br+3):
-        for j in range(bc, bc+3):
-            if grid[i][j] == val:
-                return False
-    return True
-
-def solve_backtrack(grid):
-    empty = find_empty(grid)
-    if not empty: return True
-    r, c = empty
-    for val in range(1, 10):
-        if valid(grid, r, c, val):
-            grid[r][c] = val
-            if solve_backtrack(grid):return True
-            grid[r][c] = 0
-    return False
-
-def count_solutions(grid, limit=2):
-    empty = find_empty(grid)
-    if not empty: return 1
-    r, c = empty
-    count = 0
-    for val in range(1, 10):
-        if valid(grid, r, c, val):
-            grid[r][c] = val
-            count += count_solutions(grid, limit)
-            grid[r][c] = 0
-            if count >= limit: return count
-    return count
-
-def generate_full_solution():
-    grid = [[0]*9 for _ in range(9)]
-    nums = list(range(1,10))
-    def fill():
-        empty = find_empty(grid)
-        if not empty: return True
-        r, c = empty
-        random.shuffle(nums)
-        for val in nums:
-            if valid(grid,r,c,val):
-                grid[r][c] = val
-                if fill(): return True
-                grid[r][c] = 0
-        return False
-    fill()
-    return grid
-
-def generate_puzzle(difficulty="medium"):
-    targets = {"easy":36,"medium":32,"hard":28,"insane":22}
-    target = targets.get(difficulty,32)
-    solution = generate_full_solution()
-    puzzle = deepcopy(solution)
-    cells = [(r,c) for r in range(9) for c in range(9)]
-    random.shuffle(cells)
-    attempts = 0
-    max_attempts = 8000 if difficulty=="insane" else 5000
-    while attempts < max_attempts and sum(1 for r in range(9) for c in range(9) if puzzle[r][c]!=0) > target:
-        r,c = random.choice(cells)
-        if puzzle[r][c]==0:
-            attempts+=1
-            continue
-        backup = puzzle[r][c]
-        puzzle[r][c]=0
-        if count_solutions(deepcopy(puzzle), limit=2)!=1:
-            puzzle[r][c]=backup
-        attempts+=1
-    return puzzle, solution
+def button_at(pos):
+    for i in range(len(BUTTONS)):
+        if button_rect(i).collidepoint(pos):
+            return i
+    return None
 
-# --- Drawing helpers ---
-def draw_button(surface, rect, label, theme, mouse_pos):
-    color = theme["button_hover"] if rect.collidepoint(mouse_pos) else theme["button"]
+def draw_button(surface, rect, label, theme, hover=False):
+    color = theme["button_hover"] if hover else theme["button"]
     pygame.draw.rect(surface, color, rect, border_radius=6)
     pygame.draw.rect(surface, theme["grid"], rect, 2, border_radius=6)
     txt = FONT_MED.render(label, True, theme["grid"])
     surface.blit(txt, (rect.x + rect.width//2 - txt.get_width()//2, rect.y + rect.height//2 - txt.get_height()//2))
 
+BUTTON_CACHE = {}
+
+def get_button_surface(theme_name, label, hover):
+    # each panel button is rendered once per theme and hover state
+    key = (theme_name, label, hover)
+    if key not in BUTTON_CACHE:
+        surf = pygame.Surface(button_rect(0).size, pygame.SRCALPHA)
+        draw_button(surf, surf.get_rect(), label, THEMES[theme_name], hover)
+        BUTTON_CACHE[key] = surf
+    return BUTTON_CACHE[key]
+
 def draw_gradient_background(surface, color1, color2):
+    # build one 1-pixel-wide column and stretch it across, instead of a line per row
     w, h = surface.get_size()
+    column = bytearray()
     for y in range(h):
         ratio = y / h
-        r = int(color1[0]*(1-ratio) + color2[0]*ratio)
-        g = int(color1[1]*(1-ratio) + color2[1]*ratio)
-        b = int(color1[2]*(1-ratio) + color2[2]*ratio)
-        pygame.draw.line(surface, (r,g,b), (0,y), (w,y))
+        column += bytes(int(a*(1-ratio) + b*ratio) for a, b in zip(color1[:3], color2[:3]))
+    strip = pygame.image.frombuffer(bytes(column), (1, h), "RGB")
+    surface.blit(pygame.transform.scale(strip, (w, h)), (0, 0))
+
+_background_cache = {}
+
+def get_background(theme_name):
+    if theme_name not in _background_cache:
+        theme = THEMES[theme_name]
+        bg = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
+        bg1 = tuple(min(255, c+30) for c in theme["bg"])  # top lighter
+        bg2 = theme["bg"]  # bottom darker
+        draw_gradient_background(bg, bg1, bg2)
+        _background_cache[theme_name] = bg
+    return _background_cache[theme_name]
 
 # --- Game state ---
+def json_dumps(data):
+    return orjson.dumps(data) if orjson else json.dumps(data).encode()
+
+def json_loads(raw):
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+# a single worker keeps the writes in submission order, so no file lock is needed
+SAVE_POOL = ThreadPoolExecutor(max_workers=1)
+
+def _write_json(path, payload):
+    # write next to the target and swap it in so a crash never leaves half a file
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+    except Exception: pass
+
+def notes_from_json(raw):
+    # older saves stored notes as a 9x9 grid of digit lists
+    if raw and isinstance(raw[0], list):
+        return array('H', (sum(1 << (n-1) for n in digits) for row in raw for digits in row))
+    return array('H', raw)
+
 class SudokuGame:
     def __init__(self, puzzle=None, solution=None, difficulty="medium"):
         if puzzle is None or solution is None:
             puzzle, solution = generate_puzzle(difficulty)
-        self.givens = deepcopy(puzzle)
-        self.solution = solution
-        self.cells = deepcopy(puzzle)
-        self.notes = [[set() for _ in range(9)] for __ in range(9)]
+        # boards are flat bytearrays indexed by r*9+c
+        self.givens = to_board(puzzle)
+        self.solution = to_board(solution)
+        self.cells = to_board(puzzle)
+        # one 9-bit mask per cell (i = r*9+c), bit n-1 set when note n is pencilled in
+        self.notes = array('H', [0]*81)
         self.difficulty = difficulty
         self.start_time = time.time()
         self.total_paused = 0.0
@@ -202,12 +221,26 @@ class SudokuGame:
         self.fastest = self.load_fastest()
         self.paused = False
         self.animations = {}
+        self.dirty_cells = set()
+        # conflicts[r][c] is kept up to date per move; None forces a full rebuild
+        self.conflicts = None
+        self._dup_row, self._dup_col, self._dup_box = [0]*9, [0]*9, [0]*9
+        self._state_dirty = True
+        self.recount_filled()
+
+    def recount_filled(self):
+        # number of cells holding their solution digit; the board is complete at 81
+        self.filled_correct = sum(1 for val, want in zip(self.cells, self.solution) if val and val == want)
+
+    def _track_filled(self, r, c, old_val, new_val):
+        want = self.solution[r*9+c]
+        self.filled_correct += (new_val == want) - (old_val == want)
 
     def load_fastest(self):
         if os.path.exists(STATS_FILE):
             try:
-                with open(STATS_FILE,"r") as f:
-                    data = json.load(f)
+                with open(STATS_FILE,"rb") as f:
+                    data = json_loads(f.read())
                     return data.get(self.difficulty)
             except Exception: return None
         return None
@@ -216,113 +249,151 @@ class SudokuGame:
         data = {}
         if os.path.exists(STATS_FILE):
             try:
-                with open(STATS_FILE,"r") as f:
-                    data = json.load(f)
+                with open(STATS_FILE,"rb") as f:
+                    data = json_loads(f.read())
             except Exception:
                 data={}
         prev = data.get(self.difficulty)
         if prev is None or elapsed<prev:
             data[self.difficulty]=elapsed
-            with open(STATS_FILE,"w") as f:
-                json.dump(data,f)
+            with open(STATS_FILE,"wb") as f:
+                f.write(json_dumps(data))
 
-    def is_given(self,r,c): return self.givens[r][c]!=0
+    def is_given(self,r,c): return self.givens[r*9+c]!=0
 
     def set_cell(self, r, c, val, is_note=False):
         if self.is_given(r, c):
             return
-        old_val = self.cells[r][c]
-        old_notes = set(self.notes[r][c])
+        i = r*9+c
+        old_val = self.cells[i]
+        old_notes = self.notes[i]
         self.move_stack.append((r, c, old_val, old_notes, val, is_note))
         self.redo_stack.clear()
+        self._state_dirty = True
+        self.dirty_cells.add((r, c))
         if is_note:
-            if val in self.notes[r][c]:
-                self.notes[r][c].remove(val)
-            else:
-                self.notes[r][c].add(val)
+            self.notes[i] ^= 1 << (val-1)
         else:
-            self.cells[r][c] = val
-            self.notes[r][c].clear()
+            self.cells[i] = val
+            self.notes[i] = 0
+            self._track_filled(r, c, old_val, val)
+            self._recompute_conflicts_for(r, c)
         self.animations[(r,c)] = {"type":"highlight","start":time.time()}
 
     def undo(self):
         if not self.move_stack: 
             return
         r, c, old_val, old_notes, new_val, is_note = self.move_stack.pop()
-        self.redo_stack.append((r, c, self.cells[r][c], set(self.notes[r][c]), new_val, is_note))
-        if is_note:
-            self.notes[r][c] = set(old_notes)
-        else:
-            self.cells[r][c] = old_val
-            self.notes[r][c] = set(old_notes)
+        self._state_dirty = True
+        self.dirty_cells.add((r, c))
+        i = r*9+c
+        self.redo_stack.append((r, c, self.cells[i], self.notes[i], new_val, is_note))
+        if not is_note:
+            self._track_filled(r, c, self.cells[i], old_val)
+            self.cells[i] = old_val
+            self._recompute_conflicts_for(r, c)
+        self.notes[i] = old_notes
 
     def redo(self):
         if not self.redo_stack: 
             return
         r, c, old_val, old_notes, new_val, is_note = self.redo_stack.pop()
-        self.move_stack.append((r, c, self.cells[r][c], set(self.notes[r][c]), new_val, is_note))
+        self._state_dirty = True
+        self.dirty_cells.add((r, c))
+        i = r*9+c
+        self.move_stack.append((r, c, self.cells[i], self.notes[i], new_val, is_note))
         if is_note:
-            if new_val in self.notes[r][c]:
-                if new_val in self.notes[r][c]:
-                    self.notes[r][c].remove(new_val)
-                else:
-                    self.notes[r][c].add(new_val)
-            else:
-                self.notes[r][c].add(new_val)
+            self.notes[i] ^= 1 << (new_val-1)
         else:
-            self.cells[r][c] = new_val
-            self.notes[r][c].clear()
+            self._track_filled(r, c, self.cells[i], new_val)
+            self.cells[i] = new_val
+            self.notes[i] = 0
+            self._recompute_conflicts_for(r, c)
 
     def is_complete(self):
-        return all(self.cells[r][c] == self.solution[r][c] for r in range(9) for c in range(9))
+        return self.filled_correct == 81
+
+    def _dup_mask(self, cells):
+        # bits of the digits that appear more than once among the given cells
+        seen = dup = 0
+        for i in cells:
+            val = self.cells[i]
+            if val:
+                bit = 1 << (val-1)
+                if seen & bit: dup |= bit
+                else: seen |= bit
+        return dup
+
+    def _conflict_at(self, r, c):
+        val = self.cells[r*9+c]
+        if val == 0: return False
+        return bool((self._dup_row[r]|self._dup_col[c]|self._dup_box[(r//3)*3+c//3]) & (1<<(val-1)))
+
+    def _rebuild_conflicts(self):
+        # a digit conflicts when its bit shows up twice in the same row, column or box
+        for k in range(9):
+            self._dup_row[k] = self._dup_mask(range(k*9, k*9+9))
+            self._dup_col[k] = self._dup_mask(range(k, 81, 9))
+            self._dup_box[k] = self._dup_mask(BOX_CELLS[k])
+        self.conflicts = [[self._conflict_at(r, c) for c in range(9)] for r in range(9)]
+
+    def _recompute_conflicts_for(self, r, c):
+        # only the row, column and box of the changed cell can gain or lose conflicts
+        if self.conflicts is None:
+            return
+        b = (r//3)*3 + c//3
+        self._dup_row[r] = self._dup_mask(range(r*9, r*9+9))
+        self._dup_col[c] = self._dup_mask(range(c, 81, 9))
+        self._dup_box[b] = self._dup_mask(BOX_CELLS[b])
+        i = r*9+c
+        self.conflicts[r][c] = self._conflict_at(r, c)
+        for j in PEERS[i]:
+            pr, pc = divmod(j, 9)
+            self.conflicts[pr][pc] = self._conflict_at(pr, pc)
 
     def check_conflicts(self):
-        conflicts=[[False]*9 for _ in range(9)]
-        for r in range(9):
-            for c in range(9):
-                val=self.cells[r][c]
-                if val==0: continue
-                self.cells[r][c]=0
-                if not valid(self.cells,r,c,val):
-                    conflicts[r][c]=True
-                self.cells[r][c]=val
-        return conflicts
+        # a full rebuild only happens for a fresh or freshly loaded board
+        if self.conflicts is None:
+            self._rebuild_conflicts()
+        return self.conflicts
 
     def hint(self,r,c):
         if self.hints_left<=0 or self.is_given(r,c): return False
-        val=self.solution[r][c]
+        val=self.solution[r*9+c]
         self.set_cell(r,c,val,is_note=False)
         self.hints_left-=1
         return True
 
     def auto_save(self):
+        if not self._state_dirty: return
         data={
-            "puzzle":self.givens,
-            "cells":self.cells,
-            "notes":[[list(s) for s in row] for row in self.notes],
+            "puzzle":list(self.givens),
+            "cells":list(self.cells),
+            "notes":list(self.notes),
             "difficulty":self.difficulty,
             "start_time":self.start_time,
             "total_paused":self.total_paused,
             "hints_left":self.hints_left,
         }
-        try:
-            with open(AUTOSAVE_FILE,"w") as f:
-                json.dump(data,f)
-        except Exception: pass
+        # serialize here so the snapshot is consistent; only the disk write goes to the pool
+        SAVE_POOL.submit(_write_json,AUTOSAVE_FILE,json_dumps(data))
+        self._state_dirty=False
 
     @staticmethod
     def load_autosave():
         if not os.path.exists(AUTOSAVE_FILE): return None
         try:
-            with open(AUTOSAVE_FILE,"r") as f:
-                data=json.load(f)
-            puzzle=data["puzzle"]
-            grid=deepcopy(puzzle)
-            solution=None
-            if solve_backtrack(grid): solution=grid
-            game=SudokuGame(puzzle=deepcopy(puzzle),solution=solution,difficulty=data.get("difficulty","medium"))
-            game.cells=data["cells"]
-            game.notes=[[set(lst) for lst in row] for row in data["notes"]]
+            with open(AUTOSAVE_FILE,"rb") as f:
+                data=json_loads(f.read())
+            # older saves stored the boards as 9x9 grids; to_board reads both
+            puzzle=to_board(data["puzzle"])
+            solution=bytearray(puzzle)
+            if not solve_board(solution): solution=None
+            game=SudokuGame(puzzle=puzzle,solution=solution,difficulty=data.get("difficulty","medium"))
+            game.cells=to_board(data["cells"])
+            game.recount_filled()
+            game.conflicts=None  # cells were replaced; rebuild on the next check
+            game.notes=notes_from_json(data["notes"])
             game.start_time=data.get("start_time",time.time())
             game.total_paused=data.get("total_paused",0.0)
             game.hints_left=data.get("hints_left",3)
@@ -333,36 +404,33 @@ class SudokuGame:
         filename = SAVE_SLOTS.get(slot)
         if not filename: return
         data = {
-            "puzzle": self.givens,
-            "cells": self.cells,
-            "notes": [[list(s) for s in row] for row in self.notes],
+            "puzzle": list(self.givens),
+            "cells": list(self.cells),
+            "notes": list(self.notes),
             "difficulty": self.difficulty,
             "start_time": self.start_time,
             "total_paused": self.total_paused,
             "hints_left": self.hints_left,
             "is_slot": True
         }
-        try:
-            with open(filename, "w") as f:
-                json.dump(data, f)
-        except Exception:
-            pass
+        SAVE_POOL.submit(_write_json, filename, json_dumps(data))
 
     @staticmethod
     def load_from_slot(slot):
         filename = SAVE_SLOTS.get(slot)
         if not filename or not os.path.exists(filename): return None
         try:
-            with open(filename, "r") as f:
-                data = json.load(f)
-            puzzle = data["puzzle"]
-            grid = deepcopy(puzzle)
-            solution = None
-            if solve_backtrack(grid): 
-                solution = grid
-            game = SudokuGame(puzzle=deepcopy(puzzle), solution=solution, difficulty=data.get("difficulty", "medium"))
-            game.cells = data["cells"]
-            game.notes = [[set(lst) for lst in row] for row in data["notes"]]
+            with open(filename, "rb") as f:
+                data = json_loads(f.read())
+            puzzle = to_board(data["puzzle"])
+            solution = bytearray(puzzle)
+            if not solve_board(solution):
+                solution = None
+            game = SudokuGame(puzzle=puzzle, solution=solution, difficulty=data.get("difficulty", "medium"))
+            game.cells = to_board(data["cells"])
+            game.recount_filled()
+            game.conflicts = None  # cells were replaced; rebuild on the next check
+            game.notes = notes_from_json(data["notes"])
             game.start_time = data.get("start_time", time.time())
             game.total_paused = data.get("total_paused", 0.0)
             game.hints_left = data.get("hints_left", 3)
@@ -371,81 +439,197 @@ class SudokuGame:
             return None
 
 # --- Drawing ---
-def draw_board(surface,game,selected,theme_name="light"):
-    theme=THEMES[theme_name]
-    bg1 = tuple(min(255, c+30) for c in theme["bg"])  # top lighter
-    bg2 = theme["bg"]  # bottom darker
-    draw_gradient_background(surface, bg1, bg2)
-    now = time.time()
-    for (ar,ac), anim in list(game.animations.items()):
-        if anim["type"]=="highlight":
-            elapsed = now - anim["start"]
-            alpha = max(0, 180*(1-elapsed))  # fade out 1 sec
-            if alpha <= 0:
-                del game.animations[(ar,ac)]
-                continue
-            s = pygame.Surface((CELL_SIZE,CELL_SIZE), pygame.SRCALPHA)
-            pygame.draw.rect(s, (255,255,0,int(alpha)), s.get_rect(), border_radius=6)
-            surface.blit(s, (GRID_ORIGIN[0]+ac*CELL_SIZE, GRID_ORIGIN[1]+ar*CELL_SIZE))
-    ox,oy=GRID_ORIGIN
+_EMPTY_CONFLICTS = [[False]*9 for _ in range(9)]  # shared, read-only
+
+# board drawing uses coordinates local to BOARD_SURFACE
+def cell_rect(r,c):
+    return pygame.Rect(BOARD_MARGIN+c*CELL_SIZE,BOARD_MARGIN+r*CELL_SIZE,CELL_SIZE,CELL_SIZE)
+
+# per-cell geometry for the draw loops, indexed by r*9+c; shared, read-only
+CELL_RECTS = [cell_rect(r,c) for r in range(9) for c in range(9)]
+# top-left offset of note n inside its cell
+NOTE_OFFSETS = [None]+[(6+((n-1)%3)*(CELL_SIZE//3),6+((n-1)//3)*(CELL_SIZE//3)) for n in range(1,10)]
+
+# one cell-sized surface per (theme, notes mask), built the first time that combination shows up
+NOTE_SURF_CACHE = {}
+
+def get_note_surface(theme_name,mask):
+    key=(theme_name,mask)
+    surf=NOTE_SURF_CACHE.get(key)
+    if surf is None:
+        surf=pygame.Surface((CELL_SIZE,CELL_SIZE),pygame.SRCALPHA)
+        for n in range(1,10):
+            if mask & (1<<(n-1)):
+                surf.blit(NOTE_CACHE[(theme_name,n)],NOTE_OFFSETS[n])
+        NOTE_SURF_CACHE[key]=surf
+    return surf
+
+def in_selection(r,c,selected):
+    if not selected: return False
+    sr,sc=selected
+    return r==sr or c==sc or (r//3==sr//3 and c//3==sc//3)
+
+# the rounded pop-in highlight, drawn once at full opacity and faded with set_alpha
+HIGHLIGHT_SURF = pygame.Surface((CELL_SIZE,CELL_SIZE), pygame.SRCALPHA)
+pygame.draw.rect(HIGHLIGHT_SURF, (255,255,0,255), HIGHLIGHT_SURF.get_rect(), border_radius=6)
+
+def draw_cell_animation(surface,game,r,c,now):
+    anim=game.animations.get((r,c))
+    if anim and anim["type"]=="highlight":
+        elapsed = now - anim["start"]
+        alpha = max(0, 180*(1-elapsed))  # fade out 1 sec
+        if alpha <= 0:
+            del game.animations[(r,c)]
+        else:
+            HIGHLIGHT_SURF.set_alpha(int(alpha))
+            surface.blit(HIGHLIGHT_SURF, CELL_RECTS[r*9+c].topleft)
+
+def draw_cell_content(surface,game,r,c,theme_name,conflicts):
+    i=r*9+c
+    rect=CELL_RECTS[i]
+    if conflicts[r][c]: surface.fill(THEMES[theme_name]["conflict"],rect)
+    val=game.cells[i]
+    if val!=0:
+        role="givens" if game.givens[i] else "user"
+        txt_surface,tw,th=DIGIT_CACHE[(theme_name,role,val)]
+        anim=game.animations.get((r,c))
+        if anim:
+            step = round(SCALE_STEPS*max(0, 1-(time.time()-anim["start"])))
+            if step: txt_surface,tw,th=scaled_digit(theme_name,role,val,step)
+        surface.blit(txt_surface,(rect.centerx-tw//2,rect.centery-th//2))
+    else:
+        notes=game.notes[i]
+        if notes:
+            surface.blit(get_note_surface(theme_name,notes),rect.topleft)
+
+_highlight_cache = {}
+
+def get_highlight_strips(theme_name):
+    # the selection highlight is always one row, one column and one box
+    if theme_name not in _highlight_cache:
+        color=THEMES[theme_name]["highlight"]
+        strips=[]
+        for size in ((9*CELL_SIZE,CELL_SIZE),(CELL_SIZE,9*CELL_SIZE),(3*CELL_SIZE,3*CELL_SIZE)):
+            strip=pygame.Surface(size)
+            strip.fill(color)
+            strips.append(strip)
+        _highlight_cache[theme_name]=strips
+    return _highlight_cache[theme_name]
+
+def draw_selection(surface,selected,theme_name):
+    if not selected: return
+    row,col,box=get_highlight_strips(theme_name)
+    sr,sc=selected
+    ox=oy=BOARD_MARGIN
+    surface.blit(row,(ox,oy+sr*CELL_SIZE))
+    surface.blit(col,(ox+sc*CELL_SIZE,oy))
+    surface.blit(box,(ox+(sc//3)*3*CELL_SIZE,oy+(sr//3)*3*CELL_SIZE))
+
+def draw_grid_lines(surface,theme):
+    ox=oy=BOARD_MARGIN
     cell=CELL_SIZE
-    conflicts=game.check_conflicts() if game.auto_check else [[False]*9 for _ in range(9)]
-    sr=sc=None
-    if selected: sr,sc=selected
-    for r in range(9):
-        for c in range(9):
-            rect=pygame.Rect(ox+c*cell,oy+r*cell,cell,cell)
-            if selected and (r==sr or c==sc or (r//3==sr//3 and c//3==sc//3)):
-                pygame.draw.rect(surface,theme["highlight"],rect)
-            if conflicts[r][c]: pygame.draw.rect(surface,theme["conflict"],rect)
-            val=game.cells[r][c]
-            if val!=0:
-                color=theme["givens"] if game.is_given(r,c) else theme["user"]
-                txt_surface=FONT_BIG.render(str(val),True,color)
-                if (r,c) in game.animations:
-                    scale = 1 + 0.2*max(0, 1-(time.time()-game.animations[(r,c)]["start"]))
-                    txt_surface = pygame.transform.smoothscale(txt_surface, (int(txt_surface.get_width()*scale), int(txt_surface.get_height()*scale)))
-                surface.blit(txt_surface,(ox+c*cell+cell//2-txt_surface.get_width()//2,oy+r*cell+cell//2-txt_surface.get_height()//2))
-            else:
-                notes=sorted(game.notes[r][c])
-                if notes:
-                    for n in notes:
-                        nr=(n-1)//3
-                        nc=(n-1)%3
-                        nx=ox+c*cell+6+nc*(cell//3)
-                        ny=oy+r*cell+6+nr*(cell//3)
-                        nt=FONT_SMALL.render(str(n),True,theme["note"])
-                        surface.blit(nt,(nx,ny))
-    # grid lines
     for i in range(10):
         thick=4 if i%3==0 else 1
         pygame.draw.line(surface,theme["grid"],(ox,oy+i*cell),(ox+9*cell,oy+i*cell),thick)
         pygame.draw.line(surface,theme["grid"],(ox+i*cell,oy),(ox+i*cell,oy+9*cell),thick)
-    draw_right_panel(surface,game,theme_name)
 
-def draw_right_panel(surface, game, theme_name):
+_grid_layer_cache = {}
+
+def get_grid_layer(theme_name):
+    if theme_name not in _grid_layer_cache:
+        layer=pygame.Surface(BOARD_RECT.size,pygame.SRCALPHA)
+        draw_grid_lines(layer,THEMES[theme_name])
+        _grid_layer_cache[theme_name]=layer
+    return _grid_layer_cache[theme_name]
+
+def draw_board(surface,game,selected,theme_name="light"):
+    # render the whole board into a BOARD_RECT-sized surface
+    surface.blit(get_background(theme_name),(0,0),BOARD_RECT)
+    conflicts=game.check_conflicts() if game.auto_check else _EMPTY_CONFLICTS
+    now=time.time()
+    for (r,c) in list(game.animations):
+        draw_cell_animation(surface,game,r,c,now)
+    draw_selection(surface,selected,theme_name)
+    for r in range(9):
+        for c in range(9):
+            draw_cell_content(surface,game,r,c,theme_name,conflicts)
+    surface.blit(get_grid_layer(theme_name),(0,0))
+    game.dirty_cells.clear()
+
+def draw_board_cells(surface,game,selected,theme_name="light"):
+    # repaint only cells touched since the last frame (plus their row/col/box,
+    # whose conflict and selection highlights can change with them);
+    # returns the board-local rects that changed
+    background=get_background(theme_name)
+    grid_layer=get_grid_layer(theme_name)
+    cells=set(game.animations)
+    for (r,c) in game.dirty_cells:
+        cells.add((r,c))
+        cells.update(divmod(j,9) for j in PEERS[r*9+c])
+    game.dirty_cells.clear()
+    rects=[]
+    if cells:
+        conflicts=game.check_conflicts() if game.auto_check else _EMPTY_CONFLICTS
+        now=time.time()
+        highlight=THEMES[theme_name]["highlight"]
+        for (r,c) in cells:
+            rect=CELL_RECTS[r*9+c]
+            surface.blit(background,rect,rect.move(BOARD_RECT.topleft))
+            draw_cell_animation(surface,game,r,c,now)
+            if in_selection(r,c,selected):
+                surface.fill(highlight,rect)
+            draw_cell_content(surface,game,r,c,theme_name,conflicts)
+            rects.append(rect.inflate(4,4))
+        for rect in rects:
+            surface.blit(grid_layer,rect,rect)
+    return rects
+
+def draw_frame(surface,game,theme_name="light",hovered=None):
+    # compose the whole window from the cached layers and the rendered board
+    surface.blit(get_background(theme_name),(0,0))
+    surface.blit(BOARD_SURFACE,BOARD_RECT)
+    draw_right_panel(surface,game,theme_name,hovered)
+
+def draw_incremental(surface,game,theme_name,board_rects,panel_changed=True,hovered=None):
+    # copy the changed parts of the board and, if needed, refresh the panel;
+    # returns the screen rects that changed (empty when nothing did)
+    rects=[]
+    for rect in board_rects:
+        dest=rect.move(BOARD_RECT.topleft)
+        surface.blit(BOARD_SURFACE,dest,rect)
+        rects.append(dest)
+    if panel_changed:
+        surface.blit(get_background(theme_name),PANEL_RECT,PANEL_RECT)
+        draw_right_panel(surface,game,theme_name,hovered)
+        rects.append(PANEL_RECT)
+    return rects
+
+def panel_key(game, hovered):
+    # everything the right panel shows: the hovered button and the info lines
+    return (hovered, tuple(panel_info_lines(game)))
+
+def draw_right_panel(surface, game, theme_name, hovered=None):
     theme = THEMES[theme_name]
-    x = GRID_ORIGIN[0] + 9*CELL_SIZE + 10
+    x = PANEL_X
     y = GRID_ORIGIN[1]
-    w = WIN_WIDTH - x - 20
-    mouse_pos = pygame.mouse.get_pos()
     
-    funcs = [("New (G)","g"),("Hint (H)","h"),("Notes (N)","n"),("Undo (U)","u"), 
-            ("Redo (R)","r"),("Save (S)","s"),("Load (L)","l"),("Toggle Check (C)","c"),
-            ("Pause (P)","p"),("Theme (T)","t")]
-    
-    for i, (label, _) in enumerate(funcs):
-        rect = pygame.Rect(x, y + i*50, w, 40)
-        draw_button(surface, rect, label, theme, mouse_pos)
+    # pre-rendered buttons go out in one batched blit
+    blit_list = []
+    for i, (label, _) in enumerate(BUTTONS):
+        rect = button_rect(i)
+        blit_list.append((get_button_surface(theme_name, label, i == hovered), rect.topleft))
+    surface.blits(blit_list, False)
     
     # Info panel
+    for i, line in enumerate(panel_info_lines(game)):
+        txt = FONT_MED.render(line, True, theme["grid"])
+        surface.blit(txt, (x, y + 520 + i*30))
+
+def panel_info_lines(game):
     elapsed = int(get_elapsed_time(game)) if not game.paused else int(game.pause_start - game.start_time - game.total_paused) if game.pause_start else int(get_elapsed_time(game))
     info_lines = [f"Time: {format_time(elapsed)}", f"Difficulty: {game.difficulty}", f"Hints left: {game.hints_left}"]
     if game.fastest: info_lines.append(f"Fastest: {format_time(int(game.fastest))}")
-    
-    for i, line in enumerate(info_lines):
-        txt = FONT_MED.render(line, True, theme["grid"])
-        surface.blit(txt, (x, y + 520 + i*30))
+    return info_lines
 
 def format_time(s): return f"{s//60:02d}:{s%60:02d}"
 def get_elapsed_time(game):
@@ -455,10 +639,30 @@ def get_elapsed_time(game):
         return max(0, time.time() - game.start_time - game.total_paused)
 
 # --- Overlays ---
+_overlay_cache = {}
+
+def get_overlay_panel(theme_name):
+    # the translucent dialog panel behind the win screen
+    key=("panel",theme_name)
+    if key not in _overlay_cache:
+        panel=pygame.Surface((WIN_WIDTH-100,WIN_HEIGHT-160),pygame.SRCALPHA)
+        panel.fill(THEMES[theme_name]["overlay"])
+        _overlay_cache[key]=panel
+    return _overlay_cache[key]
+
+def get_pause_layers():
+    # the dimmed backdrop and captions of the pause screen never change
+    if "pause" not in _overlay_cache:
+        dim=pygame.Surface((WIN_WIDTH,WIN_HEIGHT),pygame.SRCALPHA)
+        dim.fill((0,0,0,120))
+        txt=FONT_TITLE.render("PAUSED",True,(255,255,255))
+        hint=FONT_MED.render("Press P to resume",True,(255,255,255))
+        _overlay_cache["pause"]=(dim,txt,hint)
+    return _overlay_cache["pause"]
+
 def draw_centered_overlay(screen,text_lines,buttons=None,theme_name="light"):
     theme=THEMES[theme_name]
-    overlay_surf=pygame.Surface((WIN_WIDTH-100,WIN_HEIGHT-160),pygame.SRCALPHA)
-    overlay_surf.fill(theme["overlay"])
+    overlay_surf=get_overlay_panel(theme_name)
     ox=(WIN_WIDTH-overlay_surf.get_width())//2
     oy=(WIN_HEIGHT-overlay_surf.get_height())//2
     screen.blit(overlay_surf,(ox,oy))
@@ -467,18 +671,14 @@ def draw_centered_overlay(screen,text_lines,buttons=None,theme_name="light"):
         screen.blit(txt,(ox+overlay_surf.get_width()//2-txt.get_width()//2,oy+30+i*50))
     if buttons:
         for label,rect in buttons:
-            pygame.draw.rect(screen,theme["button"],rect)
+            screen.fill(theme["button"],rect)
             txt=FONT_MED.render(label,True,theme["grid"])
             screen.blit(txt,(rect.x+rect.width//2-txt.get_width()//2,rect.y+rect.height//2-txt.get_height()//2))
 
 def draw_pause_overlay(screen,theme_name):
-    theme=THEMES[theme_name]
-    s=pygame.Surface((WIN_WIDTH,WIN_HEIGHT),pygame.SRCALPHA)
-    s.fill((0,0,0,120))
-    screen.blit(s,(0,0))
-    txt=FONT_TITLE.render("PAUSED",True,(255,255,255))
+    dim,txt,hint=get_pause_layers()
+    screen.blit(dim,(0,0))
     screen.blit(txt,(WIN_WIDTH//2-txt.get_width()//2,WIN_HEIGHT//2-txt.get_height()//2-20))
-    hint=FONT_MED.render("Press P to resume",True,(255,255,255))
     screen.blit(hint,(WIN_WIDTH//2-hint.get_width()//2,WIN_HEIGHT//2+20))
 
 # --- Difficulty menu ---
@@ -514,6 +714,7 @@ def toggle_pause(game):
         if game.pause_start: game.total_paused+=time.time()-game.pause_start
         game.pause_start=None
         game.paused=False
+        game._state_dirty=True
     else:
         game.pause_start=time.time()
         game.paused=True
@@ -531,6 +732,13 @@ def main():
     win_overlay_info = None
     message = ""
     message_time = 0
+    drawn_key = None
+    drawn_board_key = None
+    drawn_selected = selected
+    drawn_panel_key = None
+    # index of the panel button under the mouse, tracked from MOUSEMOTION events
+    hovered_button = None
+    expose_events = {pygame.VIDEOEXPOSE, getattr(pygame, "WINDOWEXPOSED", pygame.VIDEOEXPOSE)}
     number_keys = {
         pygame.K_1: 1, pygame.K_KP1: 1,
         pygame.K_2: 2, pygame.K_KP2: 2,
@@ -544,7 +752,8 @@ def main():
     }
 
     while running:
-        clock.tick(30)
+        # nothing moves between keypresses unless a cell is animating, so idle at a lower rate
+        clock.tick(30 if game.animations else 15)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 game.auto_save()
@@ -675,6 +884,13 @@ def main():
                     show_win_overlay = False
                     sound_type.play() if sound_type else None
 
+            elif event.type == pygame.MOUSEMOTION:
+                hovered_button = button_at(event.pos)
+
+            # the window was uncovered or restored: compose and flip a full frame next tick
+            elif event.type in expose_events:
+                drawn_key = None
+
             # --- Mouse selection ---
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 mx, my = pygame.mouse.get_pos()
@@ -709,36 +925,65 @@ def main():
             game.auto_save()
             last_autosave = time.time()
 
-        # --- Drawing ---
-        draw_board(screen, game, selected, theme)
-
-        if message and time.time() - message_time < 2:
-            txt = FONT_MED.render(message, True, (0, 200, 0))
-            screen.blit(txt, (WIN_WIDTH//2 - txt.get_width()//2, WIN_HEIGHT - 40))
-        
-        if game.paused:
-            draw_pause_overlay(screen, theme)
-
-        # --- Win overlay ---
+        # --- Win check ---
         if game.is_complete() and not show_win_overlay:
             show_win_overlay = True
             win_overlay_info = int(get_elapsed_time(game))
             game.save_fastest(win_overlay_info)
             sound_win.play() if sound_win else None
 
-        if show_win_overlay and win_overlay_info is not None:
-            ox = (WIN_WIDTH - (WIN_WIDTH - 100)) // 2
-            oy = (WIN_HEIGHT - (WIN_HEIGHT - 160)) // 2
-            lines = ["You Win!", f"Time: {format_time(win_overlay_info)}"]
-            bw = 160
-            bh = 42
-            bx = ox + (WIN_WIDTH - 100)//2 - bw - 10
-            by = oy + (WIN_HEIGHT - 160) - 80
-            rect_new = pygame.Rect(bx, by, bw, bh)
-            rect_quit = pygame.Rect(bx + bw + 20, by, bw, bh)
-            draw_centered_overlay(screen, lines, buttons=[("New", rect_new), ("Quit", rect_quit)], theme_name=theme)
-
-        pygame.display.flip()
+        # --- Drawing ---
+        # the board lives in BOARD_SURFACE and is re-rendered in full only when the
+        # game, theme or check mode changes; otherwise just its dirty cells are
+        board_key = (game, theme, game.auto_check)
+        if board_key != drawn_board_key:
+            draw_board(BOARD_SURFACE, game, selected, theme)
+            board_rects = [BOARD_SURFACE.get_rect()]
+            drawn_board_key = board_key
+        else:
+            if selected != drawn_selected:
+                game.dirty_cells.update((drawn_selected, selected))
+            board_rects = draw_board_cells(BOARD_SURFACE, game, selected, theme)
+
+        # overlays and the status message need the whole window recomposed
+        message_visible = bool(message) and time.time() - message_time < 2
+        frame_key = (board_key, game.paused, show_win_overlay,
+                     (message, message_time) if message_visible else None)
+        # the panel only changes when the timer ticks a second, the hover moves or the info changes
+        current_panel_key = panel_key(game, hovered_button)
+        if game.paused or show_win_overlay or frame_key != drawn_key:
+            draw_frame(screen, game, theme, hovered_button)
+
+            if message_visible:
+                txt = FONT_MED.render(message, True, (0, 200, 0))
+                screen.blit(txt, (WIN_WIDTH//2 - txt.get_width()//2, WIN_HEIGHT - 40))
+
+            if game.paused:
+                draw_pause_overlay(screen, theme)
+
+            if show_win_overlay and win_overlay_info is not None:
+                ox = (WIN_WIDTH - (WIN_WIDTH - 100)) // 2
+                oy = (WIN_HEIGHT - (WIN_HEIGHT - 160)) // 2
+                lines = ["You Win!", f"Time: {format_time(win_overlay_info)}"]
+                bw = 160
+                bh = 42
+                bx = ox + (WIN_WIDTH - 100)//2 - bw - 10
+                by = oy + (WIN_HEIGHT - 160) - 80
+                rect_new = pygame.Rect(bx, by, bw, bh)
+                rect_quit = pygame.Rect(bx + bw + 20, by, bw, bh)
+                draw_centered_overlay(screen, lines, buttons=[("New", rect_new), ("Quit", rect_quit)], theme_name=theme)
+
+            pygame.display.flip()
+            drawn_key = frame_key
+        else:
+            rects = draw_incremental(screen, game, theme, board_rects,
+                                     current_panel_key != drawn_panel_key, hovered_button)
+            if rects:
+                pygame.display.update(rects)
+        drawn_panel_key = current_panel_key
+        drawn_selected = selected
+
+    SAVE_POOL.shutdown(wait=True)
 
 
 if __name__=="__main__":
@@ -0,0 +1,209 @@
+# Pure-Python Sudoku solver and puzzle generator; no pygame, so it can be
+# imported (and profiled or tested) on its own.
+import random
+
+# --- Sudoku utilities ---
+# Solver kernels work on a flat board (cell i = r*9+c) plus one 9-bit mask per
+# row/col/box; bit (v-1) is set when digit v is already used in that unit.
+# `empties` lists the cells that were blank on entry, so scans skip the givens.
+ROW_OF = bytes(i//9 for i in range(81))
+COL_OF = bytes(i%9 for i in range(81))
+BOX_OF = bytes((r//3)*3 + c//3 for r in range(9) for c in range(9))
+
+# PEERS[i]: the 20 other cells sharing a row, column or box with cell i
+PEERS = [tuple(j for j in range(81) if j != i and
+               (ROW_OF[j] == ROW_OF[i] or COL_OF[j] == COL_OF[i] or BOX_OF[j] == BOX_OF[i]))
+         for i in range(81)]
+
+# BOX_CELLS[b]: the 9 flat indices of box b
+BOX_CELLS = [tuple(i for i in range(81) if BOX_OF[i] == b) for b in range(9)]
+
+def flatten(grid):
+    return bytearray(val for row in grid for val in row)
+
+def unflatten(board):
+    return [list(board[r*9:r*9+9]) for r in range(9)]
+
+def to_board(grid):
+    # a fresh flat board from either a flat 81-cell sequence or a nested 9x9 grid
+    if len(grid) == 81: return bytearray(grid)
+    return flatten(grid)
+
+def _board_masks(board):
+    row_mask, col_mask, box_mask = [0]*9, [0]*9, [0]*9
+    for i in range(81):
+        val = board[i]
+        if val:
+            bit = 1 << (val-1)
+            row_mask[ROW_OF[i]] |= bit
+            col_mask[COL_OF[i]] |= bit
+            box_mask[BOX_OF[i]] |= bit
+    return row_mask, col_mask, box_mask
+
+POPCOUNT = [bin(m).count("1") for m in range(512)]
+
+def _pick_cell(board, row_mask, col_mask, box_mask, empties, good_enough=1):
+    # MRV: the empty cell with the fewest candidates, None when the board is full;
+    # the scan stops at the first cell with good_enough candidates or fewer
+    best = None
+    best_count = 10
+    for i in empties:
+        if board[i]: continue
+        r, c, b = ROW_OF[i], COL_OF[i], BOX_OF[i]
+        cand = ~(row_mask[r] | col_mask[c] | box_mask[b]) & 0x1FF
+        n = POPCOUNT[cand]
+        if n < best_count:
+            best, best_count = (i, r, c, b, cand), n
+            if n <= good_enough: return best
+    return best
+
+def _solve_flat(board, row_mask, col_mask, box_mask, empties, randomize=False):
+    cell = _pick_cell(board, row_mask, col_mask, box_mask, empties)
+    if not cell: return True
+    i, r, c, b, cand = cell
+    if not cand: return False
+    bits = []
+    while cand:
+        bit = cand & -cand
+        cand ^= bit
+        bits.append(bit)
+    if randomize: random.shuffle(bits)
+    for bit in bits:
+        board[i] = bit.bit_length()
+        row_mask[r] ^= bit; col_mask[c] ^= bit; box_mask[b] ^= bit
+        if _solve_flat(board, row_mask, col_mask, box_mask, empties, randomize): return True
+        row_mask[r] ^= bit; col_mask[c] ^= bit; box_mask[b] ^= bit
+    board[i] = 0
+    return False
+
+def _propagate(board, row_mask, col_mask, box_mask, empties, log):
+    # fill naked singles until none are left, recording each placement in log;
+    # False as soon as an empty cell runs out of candidates
+    changed = True
+    while changed:
+        changed = False
+        for i in empties:
+            if board[i]: continue
+            r, c, b = ROW_OF[i], COL_OF[i], BOX_OF[i]
+            cand = ~(row_mask[r] | col_mask[c] | box_mask[b]) & 0x1FF
+            if not cand: return False
+            if not cand & (cand-1):
+                board[i] = cand.bit_length()
+                row_mask[r] ^= cand; col_mask[c] ^= cand; box_mask[b] ^= cand
+                log.append(i)
+                changed = True
+    return True
+
+def _rewind(board, row_mask, col_mask, box_mask, log):
+    for i in log:
+        bit = 1 << (board[i]-1)
+        row_mask[ROW_OF[i]] ^= bit; col_mask[COL_OF[i]] ^= bit; box_mask[BOX_OF[i]] ^= bit
+        board[i] = 0
+
+def _count_flat(board, row_mask, col_mask, box_mask, empties, limit):
+    log = []
+    if not _propagate(board, row_mask, col_mask, box_mask, empties, log):
+        _rewind(board, row_mask, col_mask, box_mask, log)
+        return 0
+    # after propagation every open cell has at least two candidates
+    cell = _pick_cell(board, row_mask, col_mask, box_mask, empties, good_enough=2)
+    if not cell:
+        _rewind(board, row_mask, col_mask, box_mask, log)
+        return 1
+    i, r, c, b, cand = cell
+    total = 0
+    while cand:
+        bit = cand & -cand
+        cand ^= bit
+        board[i] = bit.bit_length()
+        row_mask[r] ^= bit; col_mask[c] ^= bit; box_mask[b] ^= bit
+        total += _count_flat(board, row_mask, col_mask, box_mask, empties, limit)
+        row_mask[r] ^= bit; col_mask[c] ^= bit; box_mask[b] ^= bit
+        if total >= limit: break
+    board[i] = 0
+    _rewind(board, row_mask, col_mask, box_mask, log)
+    return total
+
+def solve_board(board, randomize=False):
+    row_mask, col_mask, box_mask = _board_masks(board)
+    empties = [i for i in range(81) if not board[i]]
+    return _solve_flat(board, row_mask, col_mask, box_mask, empties, randomize)
+
+def solve_backtrack(grid):
+    board = flatten(grid)
+    if not solve_board(board): return False
+    grid[:] = unflatten(board)
+    return True
+
+def _count_board(board, limit=2):
+    row_mask, col_mask, box_mask = _board_masks(board)
+    empties = [i for i in range(81) if not board[i]]
+    return _count_flat(board, row_mask, col_mask, box_mask, empties, limit)
+
+def count_solutions(grid, limit=2):
+    return _count_board(flatten(grid), limit)
+
+def _generate_full_board():
+    # the three diagonal boxes share no row, column or box, so any permutation
+    # fits; the solver then completes the rest with almost no backtracking
+    board = bytearray(81)
+    for b in (0, 3, 6):
+        perm = random.sample(range(1,10), 9)
+        for i in range(9):
+            board[(b+i//3)*9 + b+i%3] = perm[i]
+    solve_board(board, randomize=True)
+    return board
+
+def generate_full_solution():
+    return unflatten(_generate_full_board())
+
+def _all_forced(row_mask, col_mask, box_mask, cells):
+    # True when each of the given empty cells has exactly one candidate left
+    for i in cells:
+        if POPCOUNT[~(row_mask[ROW_OF[i]] | col_mask[COL_OF[i]] | box_mask[BOX_OF[i]]) & 0x1FF] != 1:
+            return False
+    return True
+
+def _toggle(board, row_mask, col_mask, box_mask, cells, values):
+    # clear (or restore) cells, flipping their digits in the unit masks
+    for i in cells:
+        bit = 1 << (values[i]-1)
+        board[i] ^= values[i]
+        row_mask[ROW_OF[i]] ^= bit; col_mask[COL_OF[i]] ^= bit; box_mask[BOX_OF[i]] ^= bit
+
+def generate_puzzle(difficulty="medium"):
+    targets = {"easy":36,"medium":32,"hard":28,"insane":22}
+    target = targets.get(difficulty,32)
+    solution = _generate_full_board()
+    puzzle = bytearray(solution)
+    cells = list(range(81))
+    random.shuffle(cells)
+    # one pass is enough: a removal that breaks uniqueness can never become safe
+    # later, since clearing more cells only adds solutions. Holes are punched in
+    # batches that shrink near the target; a failed batch is rolled back and
+    # retried at half size. If every cleared cell is still forced by the
+    # remaining clues alone, the solution stays unique and the full count is
+    # skipped. The unit masks, the hole list and the clue count are kept up to
+    # date as cells go, so no check rescans the board; _count_flat rewinds
+    # everything it touches, so no copy is needed either.
+    row_mask, col_mask, box_mask = [0x1FF]*9, [0x1FF]*9, [0x1FF]*9
+    holes = []
+    idx = 0
+    clues = 81
+    while idx < 81 and clues > target:
+        size = max(1, (clues - target)//8)
+        while True:
+            group = cells[idx:idx+size]
+            _toggle(puzzle, row_mask, col_mask, box_mask, group, solution)
+            if (_all_forced(row_mask, col_mask, box_mask, group) or
+                    _count_flat(puzzle, row_mask, col_mask, box_mask, holes + group, 2) == 1):
+                holes += group
+                idx += len(group)
+                clues -= len(group)
+                break
+            _toggle(puzzle, row_mask, col_mask, box_mask, group, solution)
+            if size == 1:
+                idx += 1
+                break
+            size //= 2
+    return unflatten(puzzle), unflatten(solution)